@@ -12,26 +12,118 @@ MEGALEILÕES - SCRAPER COMPLETO E CORRIGIDO
 import sys
 import json
 import time
+import random
 import re
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Tuple
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from playwright.sync_api import (
+    sync_playwright, Error as PlaywrightError
+)
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve as sv
+
+try:
+    import orjson
+except ImportError:  # fallback para json da stdlib
+    orjson = None
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:  # fallback para parser puro Python
+    HTML_PARSER = 'html.parser'
 
 # Adiciona o diretório pai (scrapers/) ao path para importar supabase_client
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+# Seções principais: (url_path, category, display_name)
+SECTIONS = (
+    ('imoveis', 'Imóveis', 'Imóveis'),
+    ('veiculos', 'Veículos', 'Veículos'),
+    ('bens-de-consumo', 'Bens de Consumo', 'Bens de Consumo'),
+    ('industrial', 'Industrial', 'Industrial'),
+    ('animais', 'Animais', 'Animais'),
+    ('outros', 'Outros', 'Outros'),
+)
+
+# Seções processadas em paralelo (um navegador por worker)
+SECTION_WORKERS = 3
+
+# Espera máxima (s) honrando Retry-After quando o site limita as requisições
+MAX_RETRY_AFTER = 30
+
+# Sentinelas: fim de uma seção e fim de um worker
+_SECTION_DONE = object()
+_WORKER_DONE = object()
+
+# Itens acumulados antes de cada envio ao Supabase
+UPSERT_BATCH_SIZE = 500
+
+# Lotes enviados ao Supabase em paralelo
+UPLOAD_WORKERS = 4
+
+# Ignora cabeçalho/menu/rodapé ao parsear as páginas de listagem:
+# mantém apenas os cards (div.card) e a paginação (ul.pagination)
+LISTING_STRAINER = SoupStrainer(['div', 'ul'], class_=['card', 'pagination'])
+
+# Regexes usadas em todos os cards (compiladas uma única vez)
+_RE_PAGE = re.compile(r'pagina=(\d+)')
+_RE_PRICE = re.compile(r'R\$\s*([\d.]+,\d{2})')
+_RE_CITY_STATE = re.compile(r'([A-ZÀ-Ú][a-zà-ú]+(?:\s+[A-ZÀ-Ú][a-zà-ú]+)*)\s*,\s*([A-Z]{2})\b')
+_RE_DATE = re.compile(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})')
+_RE_NUMBER = re.compile(r'\d+')
+
+# Praças e campos lidos por _extract_auction_info_from_html numa única busca
+_AUCTION_FIELD_CLASSES = (
+    'card-first-instance-date', 'card-second-instance-date', 'card-instance-value',
+)
+_AUCTION_INFO_SELECTOR = ', '.join(
+    ['.instance'] + [f'.{cls}' for cls in _AUCTION_FIELD_CLASSES]
+)
 
+# Seletores CSS pré-compilados (evitam o lookup no cache do soupsieve a cada card)
+_SEL_CARD = sv.compile('div.card')
+_SEL_LAST_PAGE = sv.compile('ul.pagination li.last a')
+_SEL_PAGE_LINKS = sv.compile('ul.pagination li a[data-page]')
+_SEL_LINK = sv.compile('a[href]')
+_SEL_CONTENT = sv.compile('.card-content')
+_SEL_TITLE = sv.compile('.card-title')
+_SEL_IMAGE = sv.compile('a.card-image[data-bg]')
+_SEL_PRICE = sv.compile('.card-price')
+_SEL_LOCALITY = sv.compile('.card-locality')
+_SEL_TYPE = sv.compile('.card-instance-title a')
+_SEL_NUMBER = sv.compile('.card-number')
+_SEL_BID_ICON = sv.compile('i.fa-legal')
+_SEL_AUCTION_INFO = sv.compile(_AUCTION_INFO_SELECTOR)
+
+# Estados brasileiros válidos
+VALID_STATES = frozenset({
+    'AC','AL','AP','AM','BA','CE','DF','ES','GO','MA','MT','MS','MG',
+    'PA','PB','PR','PE','PI','RJ','RN','RS','RO','RR','SC','SP','SE','TO'
+})
+
+# Converte "1.234,56" -> "1234.56" em uma única passada
+_MONEY_TRANS = str.maketrans({'.': '', ',': '.'})
+
+# Fuso horário dos leilões (instância única, reaproveitada em todas as conversões)
+_TZ_SP = ZoneInfo('America/Sao_Paulo')
+
+
+@lru_cache(maxsize=4096)
 def convert_brazilian_datetime_to_postgres(date_str: str) -> Optional[str]:
     """Converte data brasileira DD/MM/YYYY HH:MM para PostgreSQL ISO format"""
     try:
         date_str = date_str.replace('às', '').strip()
         dt = datetime.strptime(date_str, '%d/%m/%Y %H:%M')
-        dt_with_tz = dt.replace(tzinfo=ZoneInfo('America/Sao_Paulo'))
+        dt_with_tz = dt.replace(tzinfo=_TZ_SP)
         return dt_with_tz.isoformat()
     except Exception:
         return None
@@ -46,14 +138,7 @@ class MegaLeiloesScraper:
         self.base_url = 'https://www.megaleiloes.com.br'
         
         # Seções principais
-        self.sections = [
-            ('imoveis', 'Imóveis', 'Imóveis'),
-            ('veiculos', 'Veículos', 'Veículos'),
-            ('bens-de-consumo', 'Bens de Consumo', 'Bens de Consumo'),
-            ('industrial', 'Industrial', 'Industrial'),
-            ('animais', 'Animais', 'Animais'),
-            ('outros', 'Outros', 'Outros'),
-        ]
+        self.sections = SECTIONS
         
         self.stats = {
             'total_scraped': 0,
@@ -64,21 +149,128 @@ class MegaLeiloesScraper:
             'pages_scraped': 0,
         }
         
+        # Protege as stats atualizadas pelos workers de seção
+        self._lock = threading.Lock()
+        
+        # Recursos que não são necessários para extrair os cards
+        self.blocked_resource_types = {'image', 'font', 'media', 'stylesheet'}
+        self.blocked_hosts = (
+            'google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+            'facebook.net', 'connect.facebook.com', 'hotjar.com', 'clarity.ms',
+        )
+        
         # Estados brasileiros válidos
-        self.valid_states = [
-            'AC','AL','AP','AM','BA','CE','DF','ES','GO','MA','MT','MS','MG',
-            'PA','PB','PR','PE','PI','RJ','RN','RS','RO','RR','SC','SP','SE','TO'
-        ]
+        self.valid_states = VALID_STATES
     
     def scrape(self) -> List[Dict]:
-        """Scrape completo do MegaLeilões"""
+        """Scrape completo do MegaLeilões (materializa todos os itens)"""
+        return list(self.iter_items())
+    
+    def iter_items(self) -> Iterator[Dict]:
+        """Scrape completo do MegaLeilões - gera os itens conforme são extraídos"""
         print("\n" + "="*70)
         print("🟢 MEGALEILÕES - SCRAPER COMPLETO")
         print("="*70)
         
-        all_items = []
+        total_items = 0
         global_ids = set()
         
+        # Seções distribuídas entre workers; cada worker tem seu próprio
+        # Playwright (a API sync só pode ser usada na thread que a criou)
+        pending_sections = queue.Queue()
+        for index, section in enumerate(self.sections):
+            pending_sections.put((index, section))
+        
+        results = queue.Queue()
+        workers = [
+            threading.Thread(
+                target=self._section_worker,
+                args=(pending_sections, results),
+                daemon=True
+            )
+            for _ in range(min(SECTION_WORKERS, len(self.sections)))
+        ]
+        for worker in workers:
+            worker.start()
+        
+        # Os itens são liberados na ordem de SECTIONS: a seção corrente sai em
+        # streaming e as seguintes ficam em buffer até ela terminar. Assim um lote
+        # presente em várias seções fica sempre com a primeira delas, como no
+        # scraping sequencial, independente da ordem em que os workers terminam.
+        buffers = {index: [] for index in range(len(self.sections))}
+        section_counts = [0] * len(self.sections)
+        done = set()
+        current = 0
+        
+        error = None
+        running = len(workers)
+        while running:
+            result = results.get()
+            if result is _WORKER_DONE:
+                running -= 1
+                continue
+            if isinstance(result, Exception):
+                error = error or result
+                continue
+            
+            index, payload = result
+            if payload is _SECTION_DONE:
+                done.add(index)
+            elif index == current:
+                if self._claim_item(payload, global_ids):
+                    section_counts[index] += 1
+                    total_items += 1
+                    yield payload
+            else:
+                buffers[index].append(payload)
+            
+            # Avança pelas seções concluídas, liberando o buffer da próxima
+            while current in done:
+                self._finish_section(current, section_counts[current])
+                current += 1
+                for item in buffers.pop(current, ()):
+                    if self._claim_item(item, global_ids):
+                        section_counts[current] += 1
+                        total_items += 1
+                        yield item
+        
+        # Seções interrompidas por erro de um worker: libera o que foi coletado
+        for index in range(current, len(self.sections)):
+            if index != current:
+                for item in buffers.pop(index, ()):
+                    if self._claim_item(item, global_ids):
+                        section_counts[index] += 1
+                        total_items += 1
+                        yield item
+            self._finish_section(index, section_counts[index])
+        
+        if error:
+            raise error  # Re-lança para ser capturado no main
+        
+        self.stats['total_scraped'] = total_items
+    
+    def _claim_item(self, item: Dict, global_ids: set) -> bool:
+        """Registra o item se o external_id ainda não foi visto (thread principal)"""
+        external_id = item['external_id']
+        if external_id in global_ids:
+            self.stats['duplicates'] += 1
+            return False
+        
+        global_ids.add(external_id)
+        if item['has_bid']:
+            self.stats['with_bids'] += 1
+        if item['image_url']:
+            self.stats['with_images'] += 1
+        return True
+    
+    def _finish_section(self, index: int, count: int):
+        """Fecha as estatísticas de uma seção já liberada"""
+        _, category, display_name = self.sections[index]
+        self.stats['by_category'][category] = count
+        print(f"✅ {count} itens coletados de {display_name}")
+    
+    def _section_worker(self, pending_sections: queue.Queue, results: queue.Queue):
+        """Worker: abre um navegador e processa seções até a fila esvaziar"""
         try:
             with sync_playwright() as p:
                 browser = p.chromium.launch(headless=True, args=['--no-sandbox'])
@@ -89,23 +281,35 @@ class MegaLeiloesScraper:
                     locale='pt-BR'
                 )
                 
+                # Bloqueia imagens/fontes/mídia (a URL da imagem vem do atributo data-bg)
+                context.route('**/*', self._route_request)
+                
                 page = context.new_page()
+                sections_done = 0
                 
-                for url_path, category, display_name in self.sections:
+                while True:
+                    try:
+                        index, (url_path, category, display_name) = pending_sections.get_nowait()
+                    except queue.Empty:
+                        break
+                    
+                    # Aba nova por seção: descarta o heap JS acumulado na anterior
+                    # (o contexto, com cache e cookies, continua o mesmo)
+                    if sections_done:
+                        fresh_page = context.new_page()
+                        page.close()
+                        page = fresh_page
+                    sections_done += 1
+                    
                     print(f"\n{'='*70}")
                     print(f"📦 {display_name}")
                     print(f"{'='*70}")
                     
-                    section_items = self._scrape_section(
-                        page, url_path, category, display_name, global_ids
-                    )
-                    
-                    all_items.extend(section_items)
-                    self.stats['by_category'][category] = len(section_items)
+                    for item in self._scrape_section(page, url_path, category, display_name):
+                        results.put((index, item))
+                    results.put((index, _SECTION_DONE))
                     
-                    print(f"✅ {len(section_items)} itens coletados de {display_name}")
-                    
-                    time.sleep(2)
+                    time.sleep(0.3)
                 
                 browser.close()
         
@@ -113,30 +317,40 @@ class MegaLeiloesScraper:
             print(f"❌ Erro geral: {e}")
             import traceback
             traceback.print_exc()
-            raise  # Re-lança para ser capturado no main
+            results.put(e)
         
-        self.stats['total_scraped'] = len(all_items)
-        return all_items
+        finally:
+            results.put(_WORKER_DONE)
+    
+    def _route_request(self, route):
+        """Aborta requisições de recursos pesados/analytics que não afetam o HTML"""
+        request = route.request
+        if request.resource_type in self.blocked_resource_types:
+            route.abort()
+        elif any(host in request.url for host in self.blocked_hosts):
+            route.abort()
+        else:
+            route.continue_()
     
     def _get_max_page(self, soup) -> int:
         """Detecta o número máximo de páginas pelo botão 'Fim'"""
         try:
             # Procura pelo botão "Fim" na paginação
-            last_link = soup.select_one('ul.pagination li.last a')
+            last_link = soup.select_one(_SEL_LAST_PAGE)
             if last_link:
                 href = last_link.get('href', '')
                 # Extrai número da página do URL
-                match = re.search(r'pagina=(\d+)', href)
+                match = _RE_PAGE.search(href)
                 if match:
                     return int(match.group(1))
             
             # Se não encontrar, tenta pelos links de página
-            page_links = soup.select('ul.pagination li a[data-page]')
+            page_links = soup.select(_SEL_PAGE_LINKS)
             if page_links:
                 pages = []
                 for link in page_links:
                     href = link.get('href', '')
-                    match = re.search(r'pagina=(\d+)', href)
+                    match = _RE_PAGE.search(href)
                     if match:
                         pages.append(int(match.group(1)))
                 if pages:
@@ -147,43 +361,53 @@ class MegaLeiloesScraper:
         except Exception:
             return 1
     
-    def _scrape_section(self, page, url_path: str, category: str,
-                       display_name: str, global_ids: set) -> List[Dict]:
-        """Scrape uma seção específica - todas as páginas"""
-        items = []
+    def _load_page(self, page, url: str):
+        """Abre a URL e aguarda o carregamento dos cards (sem esperas fixas)"""
+        page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        self._wait_for_cards(page)
+    
+    def _wait_for_cards(self, page):
+        """Aguarda o documento completo e a presença dos cards (melhor esforço)"""
+        try:
+            page.wait_for_function("document.readyState === 'complete'", timeout=10000)
+        except PlaywrightError:
+            pass
         
+        try:
+            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            page.wait_for_selector('div.card, .empty-results', timeout=5000)
+        except PlaywrightError:
+            pass
+    
+    def _render_listing(self, page, url: str):
+        """Renderiza a listagem no navegador; None se a navegação falhar"""
+        try:
+            self._load_page(page, url)
+            return self._parse_listing(page.content())
+        except PlaywrightError as e:
+            print(f"  ⚠️ Falha ao carregar {url}: {e}")
+            return None
+    
+    def _scrape_section(self, page, url_path: str, category: str,
+                       display_name: str) -> Iterator[Dict]:
+        """Scrape uma seção específica - todas as páginas (gera itens)"""
         # Primeiro acessa a página 1 para descobrir quantas páginas existem
         url = f"{self.base_url}/{url_path}"
+        page_url_prefix = f"{url}?pagina="
+        
+        # Campos comuns a todos os itens da seção
+        base_item = {
+            'source': self.source,
+            'category': category,
+            'is_active': True,
+        }
         
         try:
-            page.goto(url, wait_until="domcontentloaded", timeout=60000)
-            time.sleep(3)
-            page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            time.sleep(2)
-            
-            html = page.content()
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            # Detecta o número máximo de páginas
-            max_page = self._get_max_page(soup)
-            print(f"📄 Total de páginas detectadas: {max_page}")
-            
-            # Agora scrape todas as páginas
-            for page_num in range(1, max_page + 1):
-                if page_num == 1:
-                    current_url = url
-                    current_soup = soup
-                else:
-                    current_url = f"{url}?pagina={page_num}"
-                    page.goto(current_url, wait_until="domcontentloaded", timeout=60000)
-                    time.sleep(3)
-                    page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    time.sleep(2)
-                    current_html = page.content()
-                    current_soup = BeautifulSoup(current_html, 'html.parser')
-                
+            for page_num, max_page, current_soup in self._iter_listing_pages(
+                page, url, page_url_prefix
+            ):
                 # Extrai cards
-                cards = current_soup.select('div.card')
+                cards = current_soup.select(_SEL_CARD)
                 
                 if not cards:
                     print(f"  ⚠️ Página {page_num}/{max_page}: Nenhum card encontrado")
@@ -191,41 +415,98 @@ class MegaLeiloesScraper:
                 
                 print(f"  📄 Página {page_num}/{max_page}: {len(cards)} cards encontrados")
                 
-                page_items = 0
-                for card in cards:
-                    item = self._parse_card(card, category)
-                    
-                    if item and item['external_id'] not in global_ids:
-                        items.append(item)
-                        global_ids.add(item['external_id'])
-                        page_items += 1
-                        
-                        if item.get('has_bid'):
-                            self.stats['with_bids'] += 1
-                        
-                        if item.get('image_url'):
-                            self.stats['with_images'] += 1
-                    elif item:
-                        self.stats['duplicates'] += 1
+                # Dedup entre seções é feita em iter_items, na ordem de SECTIONS
+                parsed = [
+                    item for item in (self._parse_card(card, base_item) for card in cards)
+                    if item
+                ]
+                
+                with self._lock:
+                    self.stats['pages_scraped'] += 1
                 
-                self.stats['pages_scraped'] += 1
-                print(f"  ✅ {page_items} itens válidos extraídos da página {page_num}")
+                yield from parsed
                 
-                # Delay entre páginas
-                time.sleep(2)
+                print(f"  ✅ {len(parsed)} itens válidos extraídos da página {page_num}")
+                
+                # Delay entre páginas (com jitter)
+                time.sleep(random.uniform(0.3, 0.8))
         
         except Exception as e:
             print(f"❌ Erro ao processar seção: {e}")
             import traceback
             traceback.print_exc()
+    
+    def _parse_listing(self, html: str):
+        """Monta a árvore da listagem mantendo só cards e paginação"""
+        return BeautifulSoup(html, HTML_PARSER, parse_only=LISTING_STRAINER)
+    
+    def _fetch_listing(self, page, url: str):
+        """Busca a listagem via HTTP com cookies/UA do contexto, sem renderizar.
+        Retorna None se a requisição falhar ou o HTML não trouxer cards."""
+        # Cada APIResponse é liberada com dispose(): o Playwright guarda o corpo
+        # das respostas até o contexto ser fechado
+        request = page.context.request
+        try:
+            response = request.get(url, timeout=30000)
+            
+            # Limite de requisições: espera o tempo pedido pelo servidor e tenta de novo
+            if response.status in (429, 503):
+                try:
+                    status = response.status
+                    retry_after = response.headers.get('retry-after', '')
+                finally:
+                    response.dispose()
+                wait = min(int(retry_after) if retry_after.isdigit() else 5, MAX_RETRY_AFTER)
+                print(f"  ⏳ HTTP {status} - aguardando {wait}s")
+                time.sleep(wait)
+                response = request.get(url, timeout=30000)
+            
+            try:
+                if not response.ok:
+                    return None
+                html = response.text()
+            finally:
+                response.dispose()
+        except PlaywrightError:
+            return None
         
-        return items
+        soup = self._parse_listing(html)
+        if not soup.select_one(_SEL_CARD):
+            return None
+        
+        return soup
     
-    def _parse_card(self, card, category: str) -> Optional[Dict]:
+    def _iter_listing_pages(self, page, url: str,
+                            page_url_prefix: str) -> Iterator[Tuple[int, int, object]]:
+        """Gera (page_num, max_page, soup) para todas as páginas da seção"""
+        # Tenta primeiro o HTML do servidor; só renderiza se os cards não vierem nele
+        soup = self._fetch_listing(page, url)
+        use_http = soup is not None
+        if not use_http:
+            soup = self._render_listing(page, url)
+            if soup is None:
+                return
+        
+        # Detecta o número máximo de páginas
+        max_page = self._get_max_page(soup)
+        print(f"📄 Total de páginas detectadas: {max_page}")
+        
+        yield 1, max_page, soup
+        
+        for page_num in range(2, max_page + 1):
+            current_url = page_url_prefix + str(page_num)
+            current_soup = self._fetch_listing(page, current_url) if use_http else None
+            if current_soup is None:
+                current_soup = self._render_listing(page, current_url)
+                if current_soup is None:
+                    continue
+            yield page_num, max_page, current_soup
+    
+    def _parse_card(self, card, base_item: Dict) -> Optional[Dict]:
         """Parse de um card de leilão"""
         try:
             # 1. Extrai link
-            link_elem = card.select_one('a[href]')
+            link_elem = card.select_one(_SEL_LINK)
             if not link_elem:
                 return None
             
@@ -237,28 +518,25 @@ class MegaLeiloesScraper:
                 link = f"{self.base_url}{link}"
             
             # Remove parâmetros UTM
-            link_clean = link.split('?')[0].rstrip('/')
-            
-            # 2. Extrai external_id do link
-            external_id = None
-            parts = link_clean.split('/')
-            for part in reversed(parts):
-                if part and not part.startswith('?'):
-                    external_id = f"{self.source}_{part}"
-                    break
+            link_clean = link.partition('?')[0].rstrip('/')
             
-            if not external_id or external_id == f'{self.source}_':
+            # 2. Extrai external_id do link (último segmento do caminho)
+            slug = link_clean.rpartition('/')[2]
+            if not slug:
                 return None
             
-            # 3. Extrai texto completo
-            texto = card.get_text(separator=' ', strip=True)
+            external_id = f"{self.source}_{slug}"
+            
+            # 3. Extrai texto do corpo do card (ignora imagem/rodapé se possível)
+            content_elem = card.select_one(_SEL_CONTENT) or card
+            texto = content_elem.get_text(separator=' ', strip=True)
             
             # Filtra cards muito curtos
             if len(texto) < 20:
                 return None
             
             # 4. Título (prioriza .card-title)
-            title_elem = card.select_one('.card-title')
+            title_elem = card.select_one(_SEL_TITLE)
             if title_elem:
                 title = title_elem.get_text(strip=True)
             else:
@@ -268,7 +546,7 @@ class MegaLeiloesScraper:
             
             # 5. Imagem (data-bg do a.card-image)
             image_url = None
-            image_elem = card.select_one('a.card-image[data-bg]')
+            image_elem = card.select_one(_SEL_IMAGE)
             if image_elem:
                 image_url = image_elem.get('data-bg')
                 # Filtra imagem padrão "no-image"
@@ -286,42 +564,45 @@ class MegaLeiloesScraper:
             value_text = auction_info.get('current_value_text')
             
             if not value:
-                price_elem = card.select_one('.card-price')
+                price_elem = card.select_one(_SEL_PRICE)
                 if price_elem:
                     price_text = price_elem.get_text(strip=True)
-                    price_match = re.search(r'R\$\s*([\d.]+,\d{2})', price_text)
+                    price_match = _RE_PRICE.search(price_text)
                     if price_match:
                         value_text = f"R$ {price_match.group(1)}"
                         try:
-                            value = float(price_match.group(1).replace('.', '').replace(',', '.'))
-                        except:
+                            value = float(price_match.group(1).translate(_MONEY_TRANS))
+                        except ValueError:
                             pass
             
             # 9. Cidade e Estado (usa .card-locality se disponível)
             city = None
             state = None
             
-            locality_elem = card.select_one('.card-locality')
+            locality_elem = card.select_one(_SEL_LOCALITY)
             if locality_elem:
                 locality_text = locality_elem.get_text(strip=True)
                 # Formato: "São João Del Rei, MG"
-                match = re.match(r'^(.+),\s*([A-Z]{2})$', locality_text)
-                if match:
-                    city = match.group(1).strip()
-                    state = match.group(2).strip()
+                city_part, sep, state_part = locality_text.rpartition(',')
+                state_part = state_part.strip()
+                if sep and city_part.strip() and state_part in VALID_STATES:
+                    city = city_part.strip()
+                    state = state_part
             
-            # Se não encontrou, tenta no texto geral
+            # Se não encontrou, tenta no texto geral (só aceita UFs válidas)
             if not city or not state:
-                city_match = re.search(r'([A-ZÀ-Ú][a-zà-ú]+(?:\s+[A-ZÀ-Ú][a-zà-ú]+)*)\s*,\s*([A-Z]{2})\b', texto)
-                if city_match:
+                for city_match in _RE_CITY_STATE.finditer(texto):
+                    if city_match.group(2) not in VALID_STATES:
+                        continue
                     if not city:
                         city = city_match.group(1).strip()
                     if not state:
                         state = city_match.group(2)
+                    break
             
             # 10. Tipo de leilão (usa .card-instance-title a)
             auction_type = None
-            type_elem = card.select_one('.card-instance-title a')
+            type_elem = card.select_one(_SEL_TYPE)
             if type_elem:
                 type_text = type_elem.get_text(strip=True)
                 if 'judicial' in type_text.lower():
@@ -338,15 +619,14 @@ class MegaLeiloesScraper:
             
             # 11. Número do lote (card-number)
             batch_number = None
-            number_elem = card.select_one('.card-number')
+            number_elem = card.select_one(_SEL_NUMBER)
             if number_elem:
                 batch_number = number_elem.get_text(strip=True)
             
-            # 12. Constrói o item compatível com DB
-            item = {
-                'source': self.source,
+            # 12. Constrói o item compatível com DB (campos fixos vêm do template da seção)
+            return {
+                **base_item,
                 'external_id': external_id,
-                'category': category,
                 'title': title,
                 'description': texto,
                 'city': city,
@@ -361,26 +641,23 @@ class MegaLeiloesScraper:
                 'link': link,
                 'image_url': image_url,
                 'metadata': {'batch_number': batch_number} if batch_number else {},
-                'is_active': True,
                 'has_bid': has_bid,
                 'auction_type': auction_type,
             }
             
-            return item
-            
         except Exception:
             return None
     
     def _extract_has_bid(self, card) -> bool:
         """Verifica se o item tem lances - procura pelo ícone fa-legal"""
         try:
-            legal_icon = card.select_one('i.fa-legal')
+            legal_icon = card.select_one(_SEL_BID_ICON)
             
             if legal_icon:
                 parent_span = legal_icon.find_parent('span')
                 if parent_span:
                     text = parent_span.get_text(strip=True)
-                    numbers = re.findall(r'\d+', text)
+                    numbers = _RE_NUMBER.findall(text)
                     if numbers:
                         bid_count = int(numbers[0])
                         return bid_count > 0
@@ -402,64 +679,85 @@ class MegaLeiloesScraper:
             'discount_percentage': None,
         }
         
-        # Praça ativa (atual)
-        active_instance = card.select_one('.instance.active')
+        # Uma única busca pelas praças e seus campos; classifica pelo atributo class
+        active = {}
+        first = {}
+        owners = ()
+        for node in card.select(_SEL_AUCTION_INFO):
+            classes = node.get('class', [])
+            
+            if 'instance' in classes:
+                owners = []
+                if 'instance' not in active and 'active' in classes:
+                    active['instance'] = node
+                    owners.append(active)
+                if 'instance' not in first and 'first' in classes and 'passed' in classes:
+                    first['instance'] = node
+                    owners.append(first)
+                continue
+            
+            # Campo só vale se estiver dentro da praça corrente
+            for owner in owners:
+                if not any(parent is owner['instance'] for parent in node.parents):
+                    continue
+                for cls in _AUCTION_FIELD_CLASSES:
+                    if cls in classes:
+                        owner.setdefault(cls, node)
         
-        if active_instance:
-            # Verifica se é segunda praça
-            second_date = active_instance.select_one('.card-second-instance-date')
-            first_date = active_instance.select_one('.card-first-instance-date')
-            
-            if second_date:
+        if not active and not first:
+            return info
+        
+        # Praça ativa (atual)
+        if active:
+            # Verifica se é segunda praça (segunda tem prioridade sobre a primeira)
+            date_elem = active.get('card-second-instance-date')
+            if date_elem:
                 info['auction_round'] = 2
-                date_text = second_date.get_text(strip=True)
-                date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
-                if date_match:
-                    date_str = f"{date_match.group(1)} {date_match.group(2)}"
-                    info['auction_date'] = convert_brazilian_datetime_to_postgres(date_str)
-                
-            elif first_date:
-                info['auction_round'] = 1
-                date_text = first_date.get_text(strip=True)
-                date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
+            else:
+                date_elem = active.get('card-first-instance-date')
+                if date_elem:
+                    info['auction_round'] = 1
+            
+            if date_elem:
+                date_text = date_elem.get_text(strip=True)
+                date_match = _RE_DATE.search(date_text)
                 if date_match:
                     date_str = f"{date_match.group(1)} {date_match.group(2)}"
                     info['auction_date'] = convert_brazilian_datetime_to_postgres(date_str)
             
             # Valor atual
-            value_elem = active_instance.select_one('.card-instance-value')
+            value_elem = active.get('card-instance-value')
             if value_elem:
                 value_text = value_elem.get_text(strip=True)
                 info['current_value_text'] = value_text
                 
-                value_match = re.search(r'R\$\s*([\d.]+,\d{2})', value_text)
+                value_match = _RE_PRICE.search(value_text)
                 if value_match:
                     try:
-                        info['current_value'] = float(value_match.group(1).replace('.', '').replace(',', '.'))
-                    except:
+                        info['current_value'] = float(value_match.group(1).translate(_MONEY_TRANS))
+                    except ValueError:
                         pass
         
         # Primeira praça (histórico)
-        first_instance = card.select_one('.instance.first.passed')
-        if first_instance:
+        if first:
             # Data da primeira praça
-            date_elem = first_instance.select_one('.card-first-instance-date')
+            date_elem = first.get('card-first-instance-date')
             if date_elem:
                 date_text = date_elem.get_text(strip=True)
-                date_match = re.search(r'(\d{2}/\d{2}/\d{4})\s*às\s*(\d{2}:\d{2})', date_text)
+                date_match = _RE_DATE.search(date_text)
                 if date_match:
                     date_str = f"{date_match.group(1)} {date_match.group(2)}"
                     info['first_round_date'] = convert_brazilian_datetime_to_postgres(date_str)
             
             # Valor da primeira praça
-            value_elem = first_instance.select_one('.card-instance-value')
+            value_elem = first.get('card-instance-value')
             if value_elem:
                 value_text = value_elem.get_text(strip=True)
-                value_match = re.search(r'R\$\s*([\d.]+,\d{2})', value_text)
+                value_match = _RE_PRICE.search(value_text)
                 if value_match:
                     try:
-                        info['first_round_value'] = float(value_match.group(1).replace('.', '').replace(',', '.'))
-                    except:
+                        info['first_round_value'] = float(value_match.group(1).translate(_MONEY_TRANS))
+                    except ValueError:
                         pass
         
         # Calcula desconto (se for segunda praça)
@@ -473,6 +771,32 @@ class MegaLeiloesScraper:
         return info
 
 
+def _dump_json_line(item: Dict) -> bytes:
+    """Serializa um item como uma linha JSONL"""
+    if orjson:
+        return orjson.dumps(item) + b'\n'
+    return json.dumps(item, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+def _append_jsonl(f, items: List[Dict]):
+    """Escreve um lote de itens no arquivo JSONL já aberto"""
+    f.write(b''.join(_dump_json_line(item) for item in items))
+
+
+def _flush_batch(supabase, batch: List[Dict]) -> Dict:
+    """Envia um lote de itens ao Supabase e retorna as estatísticas do lote"""
+    try:
+        result = supabase.upsert(batch)
+        return {key: result.get(key, 0) for key in ('inserted', 'updated', 'errors')}
+    except Exception as e:
+        print(f"\n⚠️ Erro no Supabase: {e}")
+        # ✅ HEARTBEAT: Registra erro no insert
+        supabase.heartbeat_error(e, context="supabase_insert")
+        import traceback
+        traceback.print_exc()
+        return {'inserted': 0, 'updated': 0, 'errors': len(batch)}
+
+
 def main():
     """Execução principal"""
     print("\n" + "="*70)
@@ -502,72 +826,97 @@ def main():
     except Exception as e:
         print(f"\n⚠️ Erro ao inicializar heartbeat: {e}")
     
-    # Executa scraping
+    # Prepara cliente Supabase para inserção incremental
+    uploader = None
     try:
-        items = scraper.scrape()
+        if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_SERVICE_ROLE_KEY'):
+            print("\n⚠️ Variáveis SUPABASE não configuradas - pulando insert")
+        else:
+            if not supabase:
+                from supabase_client import SupabaseMegaLeiloes
+                supabase = SupabaseMegaLeiloes(service_name='megaleiloes_scraper')
+            
+            if supabase.test():
+                uploader = supabase
+            else:
+                print("⚠️ Erro na conexão com Supabase - pulando insert")
+    
+    except ImportError as e:
+        print(f"\n⚠️ Módulo supabase_client não encontrado: {e}")
+        print("   (JSON será salvo, mas não será possível inserir no banco)")
+    except Exception as e:
+        print(f"\n⚠️ Erro no Supabase: {e}")
+    
+    # Arquivo JSONL escrito incrementalmente (um item por linha)
+    output_dir = Path(__file__).parent / 'data'
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    json_file = output_dir / f'megaleiloes_{timestamp}.jsonl'
+    
+    total_items = 0
+    batch = []
+    writes = []
+    uploads = []
+    upsert_stats = {'inserted': 0, 'updated': 0, 'errors': 0}
+    
+    # Executa scraping. A escrita do JSONL roda numa thread própria (um worker,
+    # preservando a ordem das linhas) e os lotes são enviados ao Supabase em
+    # paralelo; os executores são encerrados antes do arquivo ser fechado
+    try:
+        with open(json_file, 'wb') as f, \
+                ThreadPoolExecutor(max_workers=1) as writer, \
+                ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as upload_pool:
+            for item in scraper.iter_items():
+                batch.append(item)
+                total_items += 1
+                
+                if len(batch) >= UPSERT_BATCH_SIZE:
+                    writes.append(writer.submit(_append_jsonl, f, batch))
+                    if uploader:
+                        uploads.append(upload_pool.submit(_flush_batch, uploader, batch))
+                    batch = []
+            
+            if batch:
+                writes.append(writer.submit(_append_jsonl, f, batch))
+                if uploader:
+                    uploads.append(upload_pool.submit(_flush_batch, uploader, batch))
+        
+        for future in writes:
+            future.result()
+        for future in uploads:
+            for key, value in future.result().items():
+                upsert_stats[key] += value
     except Exception as e:
         # ✅ HEARTBEAT: Registra erro fatal
         if supabase:
             supabase.heartbeat_error(e, context="scrape_main")
+            supabase.close()
         raise
     
     print(f"\n{'='*70}")
     print(f"📊 RESULTADO FINAL")
     print(f"{'='*70}")
-    print(f"✅ Total coletado: {len(items)} itens")
+    print(f"✅ Total coletado: {total_items} itens")
     print(f"📄 Páginas processadas: {scraper.stats['pages_scraped']}")
     print(f"🖼️ Itens com imagens: {scraper.stats['with_images']}")
     print(f"🔥 Itens com lances: {scraper.stats['with_bids']}")
     print(f"📄 Duplicatas filtradas: {scraper.stats['duplicates']}")
     
-    if not items:
+    if not total_items:
+        json_file.unlink(missing_ok=True)
         print("\n⚠️ Nenhum item coletado - encerrando")
+        if supabase:
+            supabase.close()
         return
     
-    # Salva JSON
-    output_dir = Path(__file__).parent / 'data'
-    output_dir.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    json_file = output_dir / f'megaleiloes_{timestamp}.json'
-    
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
     print(f"\n💾 JSON salvo: {json_file}")
     
-    # Importa e usa o cliente Supabase para inserção
-    try:
-        if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_SERVICE_ROLE_KEY'):
-            print("\n⚠️ Variáveis SUPABASE não configuradas - pulando insert")
-        else:
-            if not supabase:
-                from supabase_client import SupabaseMegaLeiloes
-                supabase = SupabaseMegaLeiloes(service_name='megaleiloes_scraper')
-            
-            print(f"\n{'='*70}")
-            print("📤 INSERINDO NO SUPABASE")
-            print(f"{'='*70}")
-            
-            if not supabase.test():
-                print("⚠️ Erro na conexão com Supabase - pulando insert")
-            else:
-                stats = supabase.upsert(items)
-                
-                print(f"\n  📈 RESULTADO:")
-                print(f"    ✅ Inseridos: {stats['inserted']}")
-                print(f"    📄 Atualizados: {stats['updated']}")
-                if stats['errors'] > 0:
-                    print(f"    ⚠️ Erros: {stats['errors']}")
-    
-    except ImportError as e:
-        print(f"\n⚠️ Módulo supabase_client não encontrado: {e}")
-        print("   (JSON salvo, mas não foi possível inserir no banco)")
-    except Exception as e:
-        print(f"\n⚠️ Erro no Supabase: {e}")
-        # ✅ HEARTBEAT: Registra erro no insert
-        if supabase:
-            supabase.heartbeat_error(e, context="supabase_insert")
-        import traceback
-        traceback.print_exc()
+    if uploader:
+        print(f"\n  📈 RESULTADO SUPABASE:")
+        print(f"    ✅ Inseridos: {upsert_stats['inserted']}")
+        print(f"    📄 Atualizados: {upsert_stats['updated']}")
+        if upsert_stats['errors'] > 0:
+            print(f"    ⚠️ Erros: {upsert_stats['errors']}")
     
     elapsed = time.time() - start_time
     minutes = int(elapsed // 60)
@@ -589,13 +938,15 @@ def main():
     # ✅ HEARTBEAT: Registra sucesso com estatísticas finais
     if supabase:
         supabase.heartbeat_success(final_stats={
-            'total_items': len(items),
+            'total_items': total_items,
             'pages_scraped': scraper.stats['pages_scraped'],
             'with_images': scraper.stats['with_images'],
             'with_bids': scraper.stats['with_bids'],
             'by_category': scraper.stats['by_category'],
             'duration_seconds': round(elapsed, 2)
         })
+        # Envia heartbeats pendentes e encerra a thread de fundo
+        supabase.close()
     
     print(f"✅ Concluído: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"{'='*70}")
@@ -10,11 +10,121 @@ SUPABASE CLIENT - MEGALEILOES_ITEMS + HEARTBEAT
 """
 
 import os
+import re
 import time
+import calendar
+import queue
+import threading
 import requests
 import traceback
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
-from typing import List, Dict, Optional
+from itertools import islice
+from typing import Iterator, List, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # fallback para json da stdlib
+    orjson = None
+    import json
+
+try:
+    import ciso8601
+except ImportError:  # fallback para datetime.fromisoformat
+    ciso8601 = None
+
+
+def _dumps(obj) -> bytes:
+    """Serializa o corpo da requisição (orjson quando disponível)"""
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+# Datas já no formato gerado por datetime.isoformat() (com offset)
+_RE_ISO_DATETIME = re.compile(
+    r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})(?::(\d{2})(?:\.\d{1,6})?)?[+-](\d{2}):(\d{2})$'
+)
+
+
+def _iso_fields_in_range(match) -> bool:
+    """Confere mês/dia/hora/offset (o regex só garante o formato)"""
+    year, month, day, hour, minute, second, offset_h, offset_m = match.groups()
+    year, month = int(year), int(month)
+    return (
+        year >= 1
+        and 1 <= month <= 12
+        and 1 <= int(day) <= calendar.monthrange(year, month)[1]
+        and int(hour) < 24
+        and int(minute) < 60
+        and int(second or 0) < 60
+        and int(offset_h) < 24
+        and int(offset_m) < 60
+    )
+
+
+def _normalize_iso_datetime(value: str) -> Optional[str]:
+    """Valida data ISO; strings já normalizadas passam sem reparse"""
+    match = _RE_ISO_DATETIME.match(value)
+    if match:
+        return value if _iso_fields_in_range(match) else None
+    try:
+        if ciso8601:
+            return ciso8601.parse_datetime(value).isoformat()
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).isoformat()
+    except ValueError:
+        return None
+
+
+def _safe_float(value, min_value: Optional[float] = 0.0) -> Optional[float]:
+    """Converte para float; números passam sem try/except (caso comum)"""
+    if not isinstance(value, (int, float)):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+    if min_value is not None and value < min_value:
+        return None
+    return float(value)
+
+
+def _safe_int(value) -> Optional[int]:
+    """Converte para int; inteiros passam sem try/except (bool vira 0/1)"""
+    if isinstance(value, int):
+        return int(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+# Valores textuais aceitos como has_bid verdadeiro
+_TRUTHY = frozenset({'true', '1', 'yes', 'sim'})
+
+
+# Espera máxima (s) honrando Retry-After do gateway (mesmo limite do scraper)
+MAX_RETRY_AFTER = 30
+
+
+class _CappedRetry(Retry):
+    """Retry do urllib3 com o Retry-After limitado a MAX_RETRY_AFTER"""
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, MAX_RETRY_AFTER)
+
+
+# Sentinela que encerra a thread de heartbeats (ver close())
+_HEARTBEAT_STOP = object()
+
+# Estados brasileiros válidos
+VALID_STATES = frozenset({
+    'AC','AL','AP','AM','BA','CE','DF','ES','GO','MA','MT','MS','MG',
+    'PA','PB','PR','PE','PI','RJ','RN','RS','RO','RR','SC','SP','SE','TO'
+})
 
 
 class SupabaseMegaLeiloes:
@@ -30,6 +140,10 @@ class SupabaseMegaLeiloes:
         self.url = self.url.rstrip('/')
         self.table = 'megaleiloes_items'
         
+        # URLs montadas uma vez (reusadas em upsert e consultas)
+        self._table_url = f"{self.url}/rest/v1/{self.table}"
+        self._upsert_url = f"{self._table_url}?on_conflict=external_id"
+        
         self.headers = {
             'apikey': self.key,
             'Authorization': f'Bearer {self.key}',
@@ -42,11 +156,41 @@ class SupabaseMegaLeiloes:
         self.session = requests.Session()
         self.session.headers.update(self.headers)
         
+        # Pool de conexões keep-alive + retry para falhas transitórias do gateway
+        # (POST incluído: os upserts usam merge-duplicates e são idempotentes;
+        # em 429/503 o backoff respeita o Retry-After do servidor, até MAX_RETRY_AFTER)
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=_CappedRetry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 502, 503, 504),
+                allowed_methods=frozenset({'GET', 'POST'}),
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
         # ============================================
         # HEARTBEAT - Configuração
         # ============================================
         self.service_name = service_name
         self.heartbeat_enabled = True
+        
+        # ✅ FIX: Headers EXPLÍCITOS para schema PUBLIC (infra_actions),
+        # em sessão própria montada uma vez
+        self._heartbeat_url = f"{self.url}/rest/v1/infra_actions?on_conflict=service_name"
+        self._heartbeat_session = requests.Session()
+        self._heartbeat_session.headers.update({
+            'apikey': self.key,
+            'Authorization': f'Bearer {self.key}',
+            'Content-Type': 'application/json',
+            'Content-Profile': 'public',
+            'Accept-Profile': 'public',
+            'Prefer': 'resolution=merge-duplicates,return=minimal'
+        })
         self.heartbeat_start_time = time.time()
         self.heartbeat_metrics = {
             'items_processed': 0,
@@ -54,6 +198,14 @@ class SupabaseMegaLeiloes:
             'errors': 0,
             'warnings': 0,
         }
+        # heartbeat_progress é chamado pelas threads de upload
+        self._metrics_lock = threading.Lock()
+        
+        # Heartbeats de progresso saem por uma thread de fundo, fora do
+        # caminho crítico dos batches
+        self._heartbeat_queue = queue.Queue(maxsize=64)
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_worker, daemon=True)
+        self._heartbeat_thread.start()
     
     # ============================================
     # MÉTODOS HEARTBEAT
@@ -68,36 +220,29 @@ class SupabaseMegaLeiloes:
         
         try:
             elapsed = time.time() - self.heartbeat_start_time
+            now_iso = datetime.now().isoformat()
             
             full_logs = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now_iso,
                 'elapsed_seconds': round(elapsed, 2),
-                'metrics': self.heartbeat_metrics.copy(),
                 **(logs or {})
             }
+            with self._metrics_lock:
+                full_logs['metrics'] = self.heartbeat_metrics.copy()
             
             payload = {
                 'service_name': self.service_name,
                 'service_type': 'scraper',
                 'status': status,
-                'last_activity': datetime.now().isoformat(),
+                'last_activity': now_iso,
                 'logs': full_logs,
                 'error_message': error_message,
                 'metadata': metadata or {}
             }
             
-            # ✅ FIX: Headers EXPLÍCITOS para schema PUBLIC (infra_actions)
-            heartbeat_headers = {
-                'apikey': self.key,
-                'Authorization': f'Bearer {self.key}',
-                'Content-Type': 'application/json',
-                'Content-Profile': 'public',  # ✅ ADICIONADO
-                'Accept-Profile': 'public',    # ✅ ADICIONADO
-                'Prefer': 'resolution=merge-duplicates,return=minimal'
-            }
-            
-            url = f"{self.url}/rest/v1/infra_actions?on_conflict=service_name"
-            r = self.session.post(url, json=[payload], headers=heartbeat_headers, timeout=30)
+            r = self._heartbeat_session.post(
+                self._heartbeat_url, data=_dumps([payload]), timeout=30
+            )
             
             return r.status_code in (200, 201)
                 
@@ -105,6 +250,34 @@ class SupabaseMegaLeiloes:
             print(f"⚠️ Erro ao enviar heartbeat: {e}")
             return False
     
+    def _heartbeat_worker(self):
+        """Envia heartbeats enfileirados (só o progresso mais recente importa)"""
+        stop = False
+        while not stop:
+            item = self._heartbeat_queue.get()
+            pending = 1
+            kwargs = None
+            while True:
+                if item is _HEARTBEAT_STOP:
+                    stop = True
+                    break
+                kwargs = item
+                try:
+                    item = self._heartbeat_queue.get_nowait()
+                    pending += 1
+                except queue.Empty:
+                    break
+            try:
+                if kwargs:
+                    self._send_heartbeat(**kwargs)
+            finally:
+                for _ in range(pending):
+                    self._heartbeat_queue.task_done()
+    
+    def _flush_heartbeats(self):
+        """Aguarda heartbeats pendentes (antes de status finais)"""
+        self._heartbeat_queue.join()
+    
     def heartbeat_start(self, custom_logs: Optional[Dict] = None) -> bool:
         """Registra início da execução do scraper"""
         logs = {
@@ -120,16 +293,24 @@ class SupabaseMegaLeiloes:
     def heartbeat_progress(self, items_processed: int = 0, pages_scraped: int = 0,
                           custom_logs: Optional[Dict] = None) -> bool:
         """Atualiza progresso durante execução"""
-        self.heartbeat_metrics['items_processed'] += items_processed
-        self.heartbeat_metrics['pages_scraped'] += pages_scraped
+        with self._metrics_lock:
+            self.heartbeat_metrics['items_processed'] += items_processed
+            self.heartbeat_metrics['pages_scraped'] += pages_scraped
+            processed = self.heartbeat_metrics['items_processed']
         
         logs = {
             'event': 'progress',
-            'message': f"Processados {self.heartbeat_metrics['items_processed']} itens",
+            'message': f"Processados {processed} itens",
             **(custom_logs or {})
         }
         
-        return self._send_heartbeat(status='active', logs=logs)
+        if not self.heartbeat_enabled or not self._heartbeat_thread.is_alive():
+            return False
+        try:
+            self._heartbeat_queue.put_nowait({'status': 'active', 'logs': logs})
+            return True
+        except queue.Full:
+            return False
     
     def heartbeat_success(self, final_stats: Optional[Dict] = None) -> bool:
         """Registra conclusão com sucesso"""
@@ -138,6 +319,7 @@ class SupabaseMegaLeiloes:
             'message': 'Scraper concluído com sucesso',
             'final_stats': final_stats or {},
         }
+        self._flush_heartbeats()
         result = self._send_heartbeat(status='active', logs=logs)
         if result:
             print("💓 Heartbeat: Sucesso registrado")
@@ -145,7 +327,8 @@ class SupabaseMegaLeiloes:
     
     def heartbeat_error(self, error: Exception, context: Optional[str] = None) -> bool:
         """Registra erro durante execução"""
-        self.heartbeat_metrics['errors'] += 1
+        with self._metrics_lock:
+            self.heartbeat_metrics['errors'] += 1
         
         error_message = f"{type(error).__name__}: {str(error)}"
         if context:
@@ -158,6 +341,7 @@ class SupabaseMegaLeiloes:
             'context': context
         }
         
+        self._flush_heartbeats()
         result = self._send_heartbeat(
             status='error',
             logs=logs,
@@ -169,7 +353,8 @@ class SupabaseMegaLeiloes:
     
     def heartbeat_warning(self, message: str, details: Optional[Dict] = None) -> bool:
         """Registra warning"""
-        self.heartbeat_metrics['warnings'] += 1
+        with self._metrics_lock:
+            self.heartbeat_metrics['warnings'] += 1
         
         logs = {
             'event': 'warning',
@@ -177,6 +362,7 @@ class SupabaseMegaLeiloes:
             'details': details or {}
         }
         
+        self._flush_heartbeats()
         return self._send_heartbeat(status='warning', logs=logs)
     
     # ============================================
@@ -188,11 +374,12 @@ class SupabaseMegaLeiloes:
         if not items:
             return {'inserted': 0, 'updated': 0, 'errors': 0}
         
-        # Prepara itens
+        # Prepara itens (um único timestamp por chamada)
+        now_iso = datetime.now().isoformat()
         prepared = []
         for item in items:
             try:
-                db_item = self._prepare_item(item)
+                db_item = self._prepare_item(item, now_iso)
                 if db_item:
                     prepared.append(db_item)
             except Exception as e:
@@ -202,124 +389,108 @@ class SupabaseMegaLeiloes:
             print("  ⚠️ Nenhum item válido para inserir")
             return {'inserted': 0, 'updated': 0, 'errors': 0}
         
-        # Insere em batches
+        # Remove duplicatas por external_id (mantém a última ocorrência);
+        # o ON CONFLICT do Postgres rejeita o mesmo id duas vezes no mesmo comando
+        unique = list({db_item['external_id']: db_item for db_item in prepared}.values())
+        if len(unique) < len(prepared):
+            print(f"  ℹ️ {len(prepared) - len(unique)} itens duplicados ignorados")
+        prepared = unique
+        
+        # Insere em batches sequenciais; o paralelismo fica com quem chama
+        # (o main do scraper envia lotes de até 500 itens em paralelo)
         stats = {'inserted': 0, 'updated': 0, 'errors': 0}
         batch_size = 500
         total_batches = (len(prepared) + batch_size - 1) // batch_size
         
         # URL com on_conflict para fazer UPSERT correto
-        url = f"{self.url}/rest/v1/{self.table}?on_conflict=external_id"
+        url = self._upsert_url
         
-        for i in range(0, len(prepared), batch_size):
+        for batch_num, i in enumerate(range(0, len(prepared), batch_size), start=1):
             batch = prepared[i:i+batch_size]
-            batch_num = (i // batch_size) + 1
+            for key, count in self._post_batch(url, batch, batch_num, total_batches).items():
+                stats[key] += count
+        
+        return stats
+    
+    def _post_batch(self, url: str, batch: List[Dict], batch_num: int,
+                    total_batches: int) -> Dict:
+        """Envia um batch e retorna suas estatísticas"""
+        try:
+            r = self.session.post(url, data=_dumps(batch), timeout=120)
             
-            try:
-                r = self.session.post(url, json=batch, timeout=120)
+            if r.status_code in (200, 201):
+                print(f"  ✅ Batch {batch_num}/{total_batches}: {len(batch)} itens (insert/update)")
                 
-                if r.status_code in (200, 201):
-                    stats['inserted'] += len(batch)
-                    print(f"  ✅ Batch {batch_num}/{total_batches}: {len(batch)} itens (insert/update)")
-                    
-                    # Atualiza heartbeat a cada batch
-                    self.heartbeat_progress(
-                        items_processed=len(batch),
-                        custom_logs={'batch': batch_num, 'total_batches': total_batches}
-                    )
-                else:
-                    error_msg = r.text[:200] if r.text else 'Sem detalhes'
-                    print(f"  ❌ Batch {batch_num}: HTTP {r.status_code} - {error_msg}")
-                    stats['errors'] += len(batch)
-            
-            except Exception as e:
-                print(f"  ❌ Batch {batch_num}: {e}")
-                stats['errors'] += len(batch)
+                # Atualiza heartbeat a cada batch
+                self.heartbeat_progress(
+                    items_processed=len(batch),
+                    custom_logs={'batch': batch_num, 'total_batches': total_batches}
+                )
+                return {'inserted': len(batch)}
             
-            if batch_num < total_batches:
-                time.sleep(0.5)
+            error_msg = r.text[:200] if r.text else 'Sem detalhes'
+            print(f"  ❌ Batch {batch_num}: HTTP {r.status_code} - {error_msg}")
         
-        return stats
+        except Exception as e:
+            print(f"  ❌ Batch {batch_num}: {e}")
+        
+        return {'errors': len(batch)}
     
-    def _prepare_item(self, item: Dict) -> Optional[Dict]:
+    def _prepare_item(self, item: Dict, now_iso: Optional[str] = None) -> Optional[Dict]:
         """Prepara item para inserção validando campos"""
-        external_id = item.get('external_id')
+        get = item.get
+        external_id = get('external_id')
         if not external_id:
             return None
         
         # Processa auction_date
-        auction_date = item.get('auction_date')
+        auction_date = get('auction_date')
         if auction_date and isinstance(auction_date, str):
-            try:
-                auction_date = auction_date.replace('Z', '+00:00')
-                dt = datetime.fromisoformat(auction_date)
-                auction_date = dt.isoformat()
-            except:
-                auction_date = None
+            auction_date = _normalize_iso_datetime(auction_date)
         
         # Processa first_round_date
-        first_round_date = item.get('first_round_date')
+        first_round_date = get('first_round_date')
         if first_round_date and isinstance(first_round_date, str):
-            try:
-                first_round_date = first_round_date.replace('Z', '+00:00')
-                dt = datetime.fromisoformat(first_round_date)
-                first_round_date = dt.isoformat()
-            except:
-                first_round_date = None
-        
-        # Valida state
-        state = item.get('state')
-        if state:
+            first_round_date = _normalize_iso_datetime(first_round_date)
+        
+        # Valida state (UF já canônica, como a do scraper, passa direto)
+        state = get('state')
+        if state and state not in VALID_STATES:
             state = str(state).strip().upper()
-            if len(state) != 2:
+            if state not in VALID_STATES:
                 state = None
         
         # Valida value
-        value = item.get('value')
+        value = get('value')
         if value is not None:
-            try:
-                value = float(value)
-                if value < 0:
-                    value = None
-            except:
-                value = None
+            value = _safe_float(value)
         
         # Valida first_round_value
-        first_round_value = item.get('first_round_value')
+        first_round_value = get('first_round_value')
         if first_round_value is not None:
-            try:
-                first_round_value = float(first_round_value)
-                if first_round_value < 0:
-                    first_round_value = None
-            except:
-                first_round_value = None
+            first_round_value = _safe_float(first_round_value)
         
         # Valida discount_percentage
-        discount_percentage = item.get('discount_percentage')
+        discount_percentage = get('discount_percentage')
         if discount_percentage is not None:
-            try:
-                discount_percentage = float(discount_percentage)
-            except:
-                discount_percentage = None
+            discount_percentage = _safe_float(discount_percentage, min_value=None)
         
         # Valida auction_round (1 ou 2)
-        auction_round = item.get('auction_round')
+        auction_round = get('auction_round')
         if auction_round is not None:
-            try:
-                auction_round = int(auction_round)
-                if auction_round not in (1, 2):
-                    auction_round = None
-            except:
+            auction_round = _safe_int(auction_round)
+            if auction_round not in (1, 2):
                 auction_round = None
         
         # Processa has_bid
-        has_bid = item.get('has_bid')
+        has_bid = get('has_bid')
         if has_bid is None:
             has_bid = False
         elif not isinstance(has_bid, bool):
-            has_bid = str(has_bid).lower() in ('true', '1', 'yes', 'sim')
+            has_bid = str(has_bid).lower() in _TRUTHY
         
         # Processa image_url
-        image_url = item.get('image_url')
+        image_url = get('image_url')
         if image_url and isinstance(image_url, str):
             image_url = image_url.strip()
             if not image_url or not image_url.startswith('http'):
@@ -328,33 +499,38 @@ class SupabaseMegaLeiloes:
             image_url = None
         
         # Processa metadata
-        metadata = item.get('metadata', {})
+        metadata = get('metadata', {})
         if not isinstance(metadata, dict):
             metadata = {}
         
         # Monta item com todos os campos da tabela
+        # (campos texto já chegam como str do scraper; sem cast por item)
+        title = str(get('title') or 'Sem Título')
+        if len(title) > 1000:
+            title = title[:1000]
+        
         data = {
             'external_id': str(external_id),
-            'category': str(item.get('category')) if item.get('category') else None,
-            'title': str(item.get('title', 'Sem Título'))[:1000],
-            'description': str(item.get('description')) if item.get('description') else None,
-            'city': str(item.get('city')) if item.get('city') else None,
+            'category': get('category') or None,
+            'title': title,
+            'description': get('description') or None,
+            'city': get('city') or None,
             'state': state,
             'value': value,
-            'value_text': str(item.get('value_text')) if item.get('value_text') else None,
+            'value_text': get('value_text') or None,
             'auction_round': auction_round,
             'auction_date': auction_date,
             'first_round_value': first_round_value,
             'first_round_date': first_round_date,
             'discount_percentage': discount_percentage,
-            'link': str(item.get('link')) if item.get('link') else None,
+            'link': get('link') or None,
             'image_url': image_url,
-            'source': str(item.get('source', 'megaleiloes')),
+            'source': str(get('source') or 'megaleiloes'),
             'metadata': metadata,
             'is_active': True,
             'has_bid': has_bid,
-            'auction_type': str(item.get('auction_type')) if item.get('auction_type') else None,
-            'last_scraped_at': datetime.now().isoformat(),
+            'auction_type': get('auction_type') or None,
+            'last_scraped_at': now_iso or datetime.now().isoformat(),
         }
         
         return data
@@ -375,18 +551,19 @@ class SupabaseMegaLeiloes:
             print(f"❌ Erro: {e}")
             return False
     
-    def get_stats(self) -> Dict:
-        """Retorna estatísticas da tabela"""
+    def get_stats(self, exact: bool = True) -> Dict:
+        """Retorna estatísticas da tabela (exact=False usa contagem estimada)"""
         try:
-            url = f"{self.url}/rest/v1/{self.table}"
-            r = self.session.get(
+            url = self._table_url
+            # HEAD: o total vem no Content-Range, sem corpo na resposta
+            r = self.session.head(
                 url,
-                params={'select': 'count'},
-                headers={**self.headers, 'Prefer': 'count=exact'},
+                params={'select': 'external_id', 'limit': 1},
+                headers={'Prefer': 'count=exact' if exact else 'count=estimated'},
                 timeout=30
             )
             
-            if r.status_code == 200:
+            if r.status_code in (200, 206):
                 total = int(r.headers.get('Content-Range', '0').split('/')[-1])
                 return {'total': total, 'table': self.table}
         except:
@@ -394,69 +571,88 @@ class SupabaseMegaLeiloes:
         
         return {'total': 0, 'table': self.table}
     
-    def get_by_category(self, category: str, limit: int = 100) -> List[Dict]:
-        """Busca itens por categoria"""
-        try:
-            url = f"{self.url}/rest/v1/{self.table}"
-            params = {
-                'category': f'eq.{category}',
-                'is_active': 'eq.true',
-                'order': 'created_at.desc',
-                'limit': limit
-            }
+    def _iter_rows(self, params: Dict, page_size: int = 500) -> Iterator[Dict]:
+        """Percorre a consulta página a página (memória constante)"""
+        if page_size < 1:
+            raise ValueError(f"page_size deve ser >= 1 (recebido {page_size})")
+        
+        offset = 0
+        while True:
+            r = self.session.get(
+                self._table_url,
+                params={**params, 'limit': page_size, 'offset': offset},
+                timeout=30
+            )
+            if r.status_code != 200:
+                return
             
-            r = self.session.get(url, params=params, timeout=30)
+            rows = orjson.loads(r.content) if orjson else r.json()
+            yield from rows
             
-            if r.status_code == 200:
-                return r.json()
+            if len(rows) < page_size:
+                return
+            offset += page_size
+    
+    def _get_rows(self, params: Dict, limit: int) -> List[Dict]:
+        """Lista até `limit` linhas da consulta"""
+        try:
+            return list(islice(self._iter_rows(params, page_size=min(limit, 500)), limit))
         except:
-            pass
-        
-        return []
+            return []
+    
+    def iter_by_category(self, category: str, page_size: int = 500) -> Iterator[Dict]:
+        """Itera todos os itens ativos de uma categoria"""
+        params = {
+            'category': f'eq.{category}',
+            'is_active': 'eq.true',
+            'order': 'created_at.desc',
+        }
+        return self._iter_rows(params, page_size)
+    
+    def get_by_category(self, category: str, limit: int = 100) -> List[Dict]:
+        """Busca itens por categoria"""
+        params = {
+            'category': f'eq.{category}',
+            'is_active': 'eq.true',
+            'order': 'created_at.desc',
+        }
+        return self._get_rows(params, limit)
     
     def get_by_round(self, auction_round: int, limit: int = 100) -> List[Dict]:
         """Busca itens por praça"""
-        try:
-            url = f"{self.url}/rest/v1/{self.table}"
-            params = {
-                'auction_round': f'eq.{auction_round}',
-                'is_active': 'eq.true',
-                'order': 'value.asc',
-                'limit': limit
-            }
-            
-            r = self.session.get(url, params=params, timeout=30)
-            
-            if r.status_code == 200:
-                return r.json()
-        except:
-            pass
-        
-        return []
+        params = {
+            'auction_round': f'eq.{auction_round}',
+            'is_active': 'eq.true',
+            'order': 'value.asc',
+        }
+        return self._get_rows(params, limit)
     
     def get_with_images(self, limit: int = 100) -> List[Dict]:
         """Busca itens que possuem imagem"""
-        try:
-            url = f"{self.url}/rest/v1/{self.table}"
-            params = {
-                'image_url': 'not.is.null',
-                'is_active': 'eq.true',
-                'order': 'created_at.desc',
-                'limit': limit
-            }
-            
-            r = self.session.get(url, params=params, timeout=30)
-            
-            if r.status_code == 200:
-                return r.json()
-        except:
-            pass
+        params = {
+            'image_url': 'not.is.null',
+            'is_active': 'eq.true',
+            'order': 'created_at.desc',
+        }
+        return self._get_rows(params, limit)
+    
+    def close(self):
+        """Envia os heartbeats pendentes, encerra a thread e fecha as sessões"""
+        thread = getattr(self, '_heartbeat_thread', None)
+        if thread and thread.is_alive():
+            self._heartbeat_queue.put(_HEARTBEAT_STOP)
+            thread.join(timeout=60)
         
-        return []
+        if hasattr(self, 'session'):
+            self.session.close()
+        if hasattr(self, '_heartbeat_session'):
+            self._heartbeat_session.close()
     
     def __del__(self):
         if hasattr(self, 'session'):
             self.session.close()
+        if hasattr(self, '_heartbeat_session'):
+            self._heartbeat_session.close()
 
 
 if __name__ == "__main__":
@@ -484,4 +680,6 @@ if __name__ == "__main__":
         print("\n✅ Teste concluído!")
         print("\nVerifique as tabelas:")
         print("  - megaleiloes_items: dados dos leilões")
-        print("  - infra_actions: heartbeat do scraper")
\ No newline at end of file
+        print("  - infra_actions: heartbeat do scraper")
+    
+    client.close()
\ No newline at end of file